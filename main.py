@@ -1,12 +1,15 @@
 import os
 import sqlite3
-import random
-import schedule
 import time
 import asyncio
-from datetime import datetime
+import hashlib
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, time as dtime
+from zoneinfo import ZoneInfo
+import aiosqlite
+from cachetools import TTLCache
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, ReplyKeyboardRemove
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, filters, ContextTypes
+from telegram.ext import AIORateLimiter, Application, CommandHandler, CallbackQueryHandler, MessageHandler, filters, ContextTypes
 import google.generativeai as genai
 from dotenv import load_dotenv
 import logging
@@ -18,21 +21,54 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 CHANNEL_ID = os.getenv("CHANNEL_ID")  # e.g., "@YourChannel"
 GROUP_ID = os.getenv("GROUP_ID")  # e.g., "@YourGroup"
 WEBSITE_URL = os.getenv("WEBSITE_URL")  # e.g., "https://yourwebsite.com"
-ADMIN_IDS = [int(id) for id in os.getenv("ADMIN_IDS").split(",")]  # Comma-separated admin IDs
+ADMIN_IDS = frozenset(int(id) for id in os.getenv("ADMIN_IDS", "").split(",") if id.strip())  # Comma-separated admin IDs
 MOTIVATION_GROUP_ID = os.getenv("MOTIVATION_GROUP_ID")  # Group for motivation submissions
+BROADCAST_SRC_CHANNEL = os.getenv("BROADCAST_SRC_CHANNEL")  # Private channel broadcasts are copied from (optional)
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")  # e.g., "https://bot.example.com"; long polling is used if unset
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+PORT = int(os.getenv("PORT", 8443))
+BOT_TZ = ZoneInfo(os.getenv("TZ", "Asia/Tashkent"))  # Daily motivation time and schedule dates
+CHANNEL_URL = f"https://t.me/{CHANNEL_ID[1:]}" if CHANNEL_ID else None
+GROUP_URL = f"https://t.me/{GROUP_ID[1:]}" if GROUP_ID else None
+DB_PATH = 'bot.db'
+DB_POOL_SIZE = 8
+BROADCAST_CONCURRENCY = 30  # Sends in flight at once; the per-second limit is AIORateLimiter's job
+BROADCAST_MAX_RETRIES = 3  # AIORateLimiter retries after a RetryAfter (429) response
+BROADCAST_BATCH_SIZE = 500
+AI_CACHE_MODE = os.getenv("AI_CACHE_MODE", "enabled")  # enabled, read-only, replay or disabled
+AI_CACHE_TTL = int(os.getenv("AI_CACHE_TTL", 7 * 24 * 3600))  # Seconds
+AI_CACHE_MODES = ("enabled", "read-only", "replay", "disabled")
+AI_CACHE_PRUNE_INTERVAL = 3600  # Seconds
 
 # Configure logging
 logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+if AI_CACHE_MODE not in AI_CACHE_MODES:
+    logger.warning(f"Unknown AI_CACHE_MODE {AI_CACHE_MODE!r}, expected one of {', '.join(AI_CACHE_MODES)}; using 'enabled'")
+    AI_CACHE_MODE = "enabled"
+
 # Configure Gemini AI
 genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-pro')
+GEMINI_MODEL = 'gemini-pro'
+GENERATION_CONFIG = {"temperature": 0.9, "max_output_tokens": 2048}
+model = genai.GenerativeModel(GEMINI_MODEL, generation_config=GENERATION_CONFIG)
 
 # Database setup
+SQLITE_PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA busy_timeout=5000",
+]
+
 def init_db():
-    conn = sqlite3.connect('bot.db')
+    conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        c.execute(pragma)
     c.execute('''CREATE TABLE IF NOT EXISTS users (user_id INTEGER PRIMARY KEY, username TEXT, is_active INTEGER)''')
     c.execute('''CREATE TABLE IF NOT EXISTS motivations (
         id INTEGER PRIMARY KEY AUTOINCREMENT, 
@@ -43,46 +79,232 @@ def init_db():
         message_id INTEGER
     )''')
     c.execute('''CREATE TABLE IF NOT EXISTS broadcasts (id INTEGER PRIMARY KEY AUTOINCREMENT, message TEXT, media TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS ai_cache (key TEXT PRIMARY KEY, response TEXT, created_at TEXT)''')
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_users_active ON users(is_active) WHERE is_active = 1''')
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_motivations_status_date ON motivations(status, schedule_date)''')
+    c.execute("PRAGMA optimize")
     conn.commit()
     conn.close()
 
+# Shared pool of pre-opened aiosqlite connections
+class SQLitePool:
+    def __init__(self, path, size=8):
+        self.path = path
+        self.size = size
+        self._queue = None
+        self._connections = []
+
+    async def open(self):
+        self._queue = asyncio.Queue(maxsize=self.size)
+        for _ in range(self.size):
+            conn = await aiosqlite.connect(self.path)
+            for pragma in SQLITE_PRAGMAS:
+                await conn.execute(pragma)
+            self._connections.append(conn)
+            self._queue.put_nowait(conn)
+
+    async def close(self):
+        for conn in self._connections:
+            await conn.close()
+        self._connections.clear()
+        self._queue = None
+
+    async def get(self) -> aiosqlite.Connection:
+        return await self._queue.get()
+
+    def release(self, conn: aiosqlite.Connection):
+        self._queue.put_nowait(conn)
+
+    @asynccontextmanager
+    async def acquire(self):
+        conn = await self.get()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+pool = SQLitePool(DB_PATH, size=DB_POOL_SIZE)
+
+# Token bucket limiting Gemini requests and tokens per minute
+class AsyncTokenBucket:
+    def __init__(self, rpm, tpm):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+    async def acquire(self, est_tokens=1):
+        est_tokens = min(est_tokens, self.tpm)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._requests >= 1 and self._tokens >= est_tokens:
+                    self._requests -= 1
+                    self._tokens -= est_tokens
+                    return
+                wait_time = max(
+                    (1 - self._requests) * 60 / self.rpm,
+                    (est_tokens - self._tokens) * 60 / self.tpm,
+                )
+                await asyncio.sleep(wait_time)
+
+gemini_limiter = AsyncTokenBucket(rpm=60, tpm=60000)
+
+# Gemini AI with response cache
+def ai_cache_key(prompt: str) -> str:
+    raw = f"{prompt}|{GEMINI_MODEL}|{GENERATION_CONFIG['temperature']}|{GENERATION_CONFIG['max_output_tokens']}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+async def call_gemini(prompt: str) -> str:
+    await gemini_limiter.acquire(est_tokens=len(prompt) // 4 + 256)
+    response = await asyncio.to_thread(model.generate_content, prompt)
+    return response.text
+
+async def generate_ai_response(prompt: str) -> str:
+    if AI_CACHE_MODE == "disabled":
+        return await call_gemini(prompt)
+
+    key = ai_cache_key(prompt)
+    cutoff = (datetime.now() - timedelta(seconds=AI_CACHE_TTL)).isoformat()
+    async with pool.acquire() as conn:
+        c = await conn.execute("SELECT response FROM ai_cache WHERE key = ? AND created_at > ?", (key, cutoff))
+        row = await c.fetchone()
+    if row:
+        return row[0]
+    if AI_CACHE_MODE == "replay":
+        raise RuntimeError("AI javobi keshda topilmadi")
+
+    text = await call_gemini(prompt)
+    if AI_CACHE_MODE == "enabled":
+        async with pool.acquire() as conn:
+            await conn.execute("INSERT OR REPLACE INTO ai_cache (key, response, created_at) VALUES (?, ?, ?)",
+                               (key, text, datetime.now().isoformat()))
+            await conn.commit()
+    return text
+
+async def prune_ai_cache(context: ContextTypes.DEFAULT_TYPE):
+    cutoff = (datetime.now() - timedelta(seconds=AI_CACHE_TTL)).isoformat()
+    async with pool.acquire() as conn:
+        await conn.execute("DELETE FROM ai_cache WHERE created_at <= ?", (cutoff,))
+        await conn.commit()
+
 # Check membership
+_membership_cache = TTLCache(maxsize=10000, ttl=180)
+_membership_locks = {}
+
+async def _fetch_membership(user_id: int, context: ContextTypes.DEFAULT_TYPE) -> bool:
+    channel_status = await context.bot.get_chat_member(CHANNEL_ID, user_id)
+    group_status = await context.bot.get_chat_member(GROUP_ID, user_id)
+    return channel_status.status in ['member', 'administrator', 'creator'] and \
+           group_status.status in ['member', 'administrator', 'creator']
+
 async def check_membership(user_id: int, context: ContextTypes.DEFAULT_TYPE) -> bool:
+    if user_id in _membership_cache:
+        return _membership_cache[user_id]
+    lock = _membership_locks.setdefault(user_id, asyncio.Lock())
     try:
-        channel_status = await context.bot.get_chat_member(CHANNEL_ID, user_id)
-        group_status = await context.bot.get_chat_member(GROUP_ID, user_id)
-        return channel_status.status in ['member', 'administrator', 'creator'] and \
-               group_status.status in ['member', 'administrator', 'creator']
+        async with lock:
+            if user_id in _membership_cache:
+                return _membership_cache[user_id]
+            is_member = await _fetch_membership(user_id, context)
+            if is_member:
+                _membership_cache[user_id] = is_member
+            return is_member
     except Exception as e:
         logger.error(f"Error checking membership: {e}")
         return False
+    finally:
+        if _membership_locks.get(user_id) is lock and not lock.locked():
+            del _membership_locks[user_id]
+
+def invalidate_membership(user_id: int):
+    _membership_cache.pop(user_id, None)
 
 # Main keyboard
+MAIN_KEYBOARD = ReplyKeyboardMarkup([
+    ["Yordam", "Biz haqimizda"],
+    ["Kanal", "Guruh", "Veb sayt"]
+], resize_keyboard=True)
+
 def get_main_keyboard():
-    keyboard = [
-        ["Yordam", "Biz haqimizda"],
-        ["Kanal", "Guruh", "Veb sayt"]
-    ]
-    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+    return MAIN_KEYBOARD
 
 # Inline keyboard for membership
+MEMBERSHIP_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("Kanalga a'zo bo'lish", url=CHANNEL_URL)],
+    [InlineKeyboardButton("Guruhga a'zo bo'lish", url=GROUP_URL)],
+    [InlineKeyboardButton("Tekshirish", callback_data="check_membership")]
+])
+
 def get_membership_keyboard():
-    keyboard = [
-        [InlineKeyboardButton("Kanalga a'zo bo'lish", url=f"https://t.me/{CHANNEL_ID[1:]}")],
-        [InlineKeyboardButton("Guruhga a'zo bo'lish", url=f"https://t.me/{GROUP_ID[1:]}")],
-        [InlineKeyboardButton("Tekshirish", callback_data="check_membership")]
-    ]
-    return InlineKeyboardMarkup(keyboard)
+    return MEMBERSHIP_KEYBOARD
+
+# Inline keyboard for motivation moderation
+MODERATION_BUTTONS = [
+    [("Qabul qilish", "approve_{}"), ("Bekor qilish", "reject_{}")],
+    [("1 kun", "schedule_{}_1"), ("2 kun", "schedule_{}_2"), ("3 kun", "schedule_{}_3")]
+]
+
+def get_moderation_keyboard(motivation_id: int):
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(label, callback_data=data.format(motivation_id)) for label, data in row]
+        for row in MODERATION_BUTTONS
+    ])
+
+# Send one message to many users concurrently
+async def send_to_users(context: ContextTypes.DEFAULT_TYPE, user_ids, text, reply_markup=None, source_message_id=None):
+    sem = asyncio.Semaphore(BROADCAST_CONCURRENCY)
+
+    async def _send(uid):
+        async with sem:
+            try:
+                if source_message_id:
+                    await context.bot.copy_message(uid, BROADCAST_SRC_CHANNEL, source_message_id, reply_markup=reply_markup)
+                else:
+                    await context.bot.send_message(uid, text, reply_markup=reply_markup)
+            except Exception as e:
+                logger.error(f"Error sending message to {uid}: {e}")
+
+    await asyncio.gather(*[_send(uid) for uid in user_ids], return_exceptions=True)
+
+# Send one message to all active users, reading them in batches
+async def send_to_active_users(context: ContextTypes.DEFAULT_TYPE, text, reply_markup=None):
+    source_message_id = None
+    if BROADCAST_SRC_CHANNEL:
+        try:
+            source = await context.bot.send_message(BROADCAST_SRC_CHANNEL, text)
+            source_message_id = source.message_id
+        except Exception as e:
+            logger.error(f"Error posting to broadcast source channel, sending directly: {e}")
+    last_user_id = -1
+    while True:
+        async with pool.acquire() as conn:
+            c = await conn.execute("SELECT user_id FROM users WHERE is_active = 1 AND user_id > ? ORDER BY user_id LIMIT ?",
+                                   (last_user_id, BROADCAST_BATCH_SIZE))
+            batch = await c.fetchall()
+        if not batch:
+            break
+        last_user_id = batch[-1][0]
+        await send_to_users(context, [user[0] for user in batch], text, reply_markup=reply_markup,
+                            source_message_id=source_message_id)
 
 # Start command
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
-    conn = sqlite3.connect('bot.db')
-    c = conn.cursor()
-    c.execute("INSERT OR REPLACE INTO users (user_id, username, is_active) VALUES (?, ?, ?)", 
-              (user_id, update.effective_user.username, 1))
-    conn.commit()
-    conn.close()
+    async with pool.acquire() as conn:
+        await conn.execute("""INSERT INTO users (user_id, username, is_active) VALUES (?, ?, ?)
+                              ON CONFLICT(user_id) DO UPDATE SET username = excluded.username, is_active = excluded.is_active""",
+                           (user_id, update.effective_user.username, 1))
+        await conn.commit()
 
     if await check_membership(user_id, context):
         await update.message.reply_text(
@@ -98,11 +320,9 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # Stop command
 async def stop(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
-    conn = sqlite3.connect('bot.db')
-    c = conn.cursor()
-    c.execute("UPDATE users SET is_active = 0 WHERE user_id = ?", (user_id,))
-    conn.commit()
-    conn.close()
+    async with pool.acquire() as conn:
+        await conn.execute("UPDATE users SET is_active = 0 WHERE user_id = ?", (user_id,))
+        await conn.commit()
     await update.message.reply_text("Bot to'xtatildi. Qayta boshlash uchun /start buyrug'ini yuboring.")
 
 # Help command
@@ -134,56 +354,55 @@ async def ai_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text("Gemini AI bilan suhbat boshlandi. Savolingizni yozing:")
     context.user_data['ai_mode'] = True
 
+# Channel, group and website links
+async def channel_link(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await update.message.reply_text(f"Kanal: {CHANNEL_URL}")
+
+async def group_link(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await update.message.reply_text(f"Guruh: {GROUP_URL}")
+
+async def website_link(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await update.message.reply_text(f"Veb sayt: {WEBSITE_URL}")
+
+# Main keyboard buttons
+TEXT_ROUTES = {
+    "Yordam": help_command,
+    "Biz haqimizda": about,
+    "Kanal": channel_link,
+    "Guruh": group_link,
+    "Veb sayt": website_link,
+}
+
 # Handle text messages
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     text = update.message.text
 
-    if text in ["Yordam"]:
-        await help_command(update, context)
-        return
-    elif text in ["Biz haqimizda"]:
-        await about(update, context)
-        return
-    elif text == "Kanal":
-        await update.message.reply_text(f"Kanal: https://t.me/{CHANNEL_ID[1:]}")
-        return
-    elif text == "Guruh":
-        await update.message.reply_text(f"Guruh: https://t.me/{GROUP_ID[1:]}")
-        return
-    elif text == "Veb sayt":
-        await update.message.reply_text(f"Veb sayt: {WEBSITE_URL}")
+    handler = TEXT_ROUTES.get(text)
+    if handler:
+        await handler(update, context)
         return
 
     if context.user_data.get('ai_mode', False):
         try:
-            response = model.generate_content(text)
-            await update.message.reply_text(response.text)
+            response = await generate_ai_response(text)
+            await update.message.reply_text(response)
         except Exception as e:
             await update.message.reply_text(f"Xato yuz berdi: {str(e)}")
         return
 
     # Handle motivation submission
-    conn = sqlite3.connect('bot.db')
-    c = conn.cursor()
-    c.execute("INSERT INTO motivations (text, submitted_by, status) VALUES (?, ?, ?)", 
-              (text, user_id, 'pending'))
-    motivation_id = c.lastrowid
-    conn.commit()
-    conn.close()
+    async with pool.acquire() as conn:
+        c = await conn.execute("INSERT INTO motivations (text, submitted_by, status) VALUES (?, ?, ?)", 
+                               (text, user_id, 'pending'))
+        motivation_id = c.lastrowid
+        await conn.commit()
 
     # Notify admins in motivation group
-    keyboard = [
-        [InlineKeyboardButton("Qabul qilish", callback_data=f"approve_{motivation_id}"),
-         InlineKeyboardButton("Bekor qilish", callback_data=f"reject_{motivation_id}")],
-        [InlineKeyboardButton("1 kun", callback_data=f"schedule_{motivation_id}_1"),
-         InlineKeyboardButton("2 kun", callback_data=f"schedule_{motivation_id}_2"),
-         InlineKeyboardButton("3 kun", callback_data=f"schedule_{motivation_id}_3")]
-    ]
     await context.bot.send_message(
         MOTIVATION_GROUP_ID, 
         f"Yangi motivatsiya:\n{text}\nYuboruvchi: @{update.effective_user.username}",
-        reply_markup=InlineKeyboardMarkup(keyboard)
+        reply_markup=get_moderation_keyboard(motivation_id)
     )
     await update.message.reply_text("Motivatsiyangiz adminga yuborildi. Tasdiqlanishini kuting.")
 
@@ -196,16 +415,7 @@ async def broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Xabar yuborish uchun matn kiriting: /broadcast Xabar matni")
         return
     message = " ".join(context.args)
-    conn = sqlite3.connect('bot.db')
-    c = conn.cursor()
-    c.execute("SELECT user_id FROM users WHERE is_active = 1")
-    users = c.fetchall()
-    for user in users:
-        try:
-            await context.bot.send_message(user[0], message)
-        except Exception as e:
-            logger.error(f"Error sending broadcast to {user[0]}: {e}")
-    conn.close()
+    await send_to_active_users(context, message)
     await update.message.reply_text("Xabar barcha foydalanuvchilarga yuborildi.")
 
 # Callback queries
@@ -215,6 +425,7 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
 
     if data == "check_membership":
+        invalidate_membership(query.from_user.id)
         if await check_membership(query.from_user.id, context):
             await query.message.edit_text("Tabriklaymiz! Endi botdan foydalanishingiz mumkin.", 
                                          reply_markup=None)
@@ -228,103 +439,89 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     if data.startswith("approve_"):
         motivation_id = int(data.split("_")[1])
-        conn = sqlite3.connect('bot.db')
-        c = conn.cursor()
-        c.execute("UPDATE motivations SET status = 'approved' WHERE id = ?", (motivation_id,))
-        c.execute("SELECT text FROM motivations WHERE id = ?", (motivation_id,))
-        text = c.fetchone()[0]
-        conn.commit()
-        conn.close()
+        async with pool.acquire() as conn:
+            await conn.execute("UPDATE motivations SET status = 'approved' WHERE id = ?", (motivation_id,))
+            c = await conn.execute("SELECT text FROM motivations WHERE id = ?", (motivation_id,))
+            text = (await c.fetchone())[0]
+            await conn.commit()
 
         # Send to all users with like/share buttons
         keyboard = [
             [InlineKeyboardButton("👍 Like", callback_data=f"like_{motivation_id}"),
              InlineKeyboardButton("📤 Ulashish", switch_inline_query=text)]
         ]
-        conn = sqlite3.connect('bot.db')
-        c = conn.cursor()
-        c.execute("SELECT user_id FROM users WHERE is_active = 1")
-        users = c.fetchall()
-        for user in users:
-            try:
-                await context.bot.send_message(user[0], text, reply_markup=InlineKeyboardMarkup(keyboard))
-            except Exception as e:
-                logger.error(f"Error sending motivation to {user[0]}: {e}")
-        conn.close()
+        await send_to_active_users(context, text, reply_markup=InlineKeyboardMarkup(keyboard))
         await query.message.edit_text(f"Motivatsiya tasdiqlandi va yuborildi:\n{text}")
 
     elif data.startswith("reject_"):
         motivation_id = int(data.split("_")[1])
-        conn = sqlite3.connect('bot.db')
-        c = conn.cursor()
-        c.execute("UPDATE motivations SET status = 'rejected' WHERE id = ?", (motivation_id,))
-        conn.commit()
-        conn.close()
+        async with pool.acquire() as conn:
+            await conn.execute("UPDATE motivations SET status = 'rejected' WHERE id = ?", (motivation_id,))
+            await conn.commit()
         await query.message.edit_text("Motivatsiya bekor qilindi.")
 
     elif data.startswith("schedule_"):
-        motivation_id, days = data.split("_")[1], data.split("_")[2]
-        schedule_date = (datetime.now() + timedelta(days=int(days))).strftime('%Y-%m-%d')
-        conn = sqlite3.connect('bot.db')
-        c = conn.cursor()
-        c.execute("UPDATE motivations SET status = 'approved', schedule_date = ? WHERE id = ?", 
-                  (schedule_date, motivation_id))
-        conn.commit()
-        conn.close()
+        _, motivation_id, days = data.split("_")
+        schedule_date = (datetime.now(BOT_TZ) + timedelta(days=int(days))).strftime('%Y-%m-%d')
+        async with pool.acquire() as conn:
+            await conn.execute("UPDATE motivations SET status = 'approved', schedule_date = ? WHERE id = ?", 
+                               (schedule_date, motivation_id))
+            await conn.commit()
         await query.message.edit_text(f"Motivatsiya {days} kundan keyin yuboriladi.")
 
     elif data.startswith("like_"):
         await query.message.edit_text(f"{query.message.text}\n👍 Sizga yoqdi!")
 
 # Daily motivation
-def send_daily_motivation(context: ContextTypes.DEFAULT_TYPE):
-    conn = sqlite3.connect('bot.db')
-    c = conn.cursor()
-    c.execute("SELECT text FROM motivations WHERE status = 'approved' AND (schedule_date IS NULL OR schedule_date = ?)", 
-              (datetime.now().strftime('%Y-%m-%d'),))
-    motivations = c.fetchall()
-    if motivations:
-        motivation = random.choice(motivations)[0]
-        c.execute("SELECT user_id FROM users WHERE is_active = 1")
-        users = c.fetchall()
-        for user in users:
-            try:
-                context.job_queue.run_once(
-                    lambda ctx: ctx.bot.send_message(user[0], motivation, 
-                                                   reply_markup=InlineKeyboardMarkup([
-                                                       [InlineKeyboardButton("👍 Like", callback_data="like_daily"),
-                                                        InlineKeyboardButton("📤 Ulashish", switch_inline_query=motivation)]
-                                                   ])),
-                    0
-                )
-            except Exception as e:
-                logger.error(f"Error sending daily motivation to {user[0]}: {e}")
-    conn.close()
+async def send_daily_motivation(context: ContextTypes.DEFAULT_TYPE):
+    async with pool.acquire() as conn:
+        c = await conn.execute("SELECT text FROM motivations WHERE status = 'approved' AND (schedule_date IS NULL OR schedule_date = ?) "
+                               "ORDER BY RANDOM() LIMIT 1", 
+                               (datetime.now(BOT_TZ).strftime('%Y-%m-%d'),))
+        row = await c.fetchone()
+    if not row:
+        return
+    motivation = row[0]
+    keyboard = InlineKeyboardMarkup([
+        [InlineKeyboardButton("👍 Like", callback_data="like_daily"),
+         InlineKeyboardButton("📤 Ulashish", switch_inline_query=motivation)]
+    ])
+    await send_to_active_users(context, motivation, reply_markup=keyboard)
 
-# Schedule daily motivation at 8:00 AM
-schedule.every().day.at("08:00").do(lambda: send_daily_motivation)
+async def post_init(application: Application):
+    await pool.open()
 
-async def run_scheduler():
-    while True:
-        schedule.run_pending()
-        await asyncio.sleep(60)
+async def post_shutdown(application: Application):
+    await pool.close()
 
 def main():
     init_db()
-    app = Application.builder().token(TOKEN).build()
+    app = (Application.builder().token(TOKEN).concurrent_updates(True).rate_limiter(AIORateLimiter(max_retries=BROADCAST_MAX_RETRIES))
+           .post_init(post_init).post_shutdown(post_shutdown).build())
 
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("stop", stop))
     app.add_handler(CommandHandler("help", help_command))
-    app.add_handler(CommandHandler("ai", ai_command))
+    app.add_handler(CommandHandler("ai", ai_command, block=False))
     app.add_handler(CommandHandler("about", about))
     app.add_handler(CommandHandler("broadcast", broadcast))
     app.add_handler(CallbackQueryHandler(button_callback))
-    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
-
-    # Run scheduler in background
-    asyncio.get_event_loop().create_task(run_scheduler())
-    app.run_polling()
+    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message, block=False))
+
+    # Daily motivation at 8:00 AM
+    app.job_queue.run_daily(send_daily_motivation, time=dtime(hour=8, minute=0, tzinfo=BOT_TZ))
+    app.job_queue.run_repeating(prune_ai_cache, interval=AI_CACHE_PRUNE_INTERVAL, first=60)
+
+    if WEBHOOK_URL:
+        app.run_webhook(
+            listen="0.0.0.0",
+            port=PORT,
+            url_path=TOKEN,
+            webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{TOKEN}",
+            secret_token=WEBHOOK_SECRET
+        )
+    else:
+        app.run_polling()
 
 if __name__ == "__main__":
     main()